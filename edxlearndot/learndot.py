@@ -16,40 +16,132 @@ enrolments and edX enrollments.
 
 from __future__ import absolute_import, unicode_literals
 
-import functools
-import hashlib
+import collections
 import logging
 import os
+import random
+import threading
+from datetime import datetime
+from functools import lru_cache
 
 import dateutil.parser
 import requests
 from retrying import retry
+
+try:
+    # optional: speeds up encoding the bulk search payloads and
+    # decoding their large result lists
+    import orjson
+except ImportError:
+    orjson = None
 from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned
 from django.db import IntegrityError
+from django.utils import timezone
 
 from edxlearndot.models import EnrolmentStatusLog
 
 log = logging.getLogger(__name__)
 
 
-LEARNDOT_RETRY_WAIT = getattr(settings, 'LEARNDOT_RETRY_WAIT_SECONDS', 5) * 1000
-LEARNDOT_RETRY_MAX_ATTEMPTS = getattr(settings, 'LEARNDOT_RETRY_MAX_ATTEMPTS', 10)
+#: Defaults for the retry policy, overridable via the settings
+#: LEARNDOT_RETRY_WAIT_SECONDS, LEARNDOT_RETRY_MAX_ATTEMPTS, and
+#: LEARNDOT_RETRY_BACKOFF_CAP_SECONDS, or per method via
+#: `learndot_retry` arguments.
+DEFAULT_RETRY_WAIT_SECONDS = 5
+DEFAULT_RETRY_MAX_ATTEMPTS = 10
+DEFAULT_RETRY_BACKOFF_CAP_SECONDS = 30
 
-def cmp(a, b):
-    """
-    Compares elements of two lists
+#: Transient statuses worth retrying: 429 Too Many Requests, plus the
+#: 502/503/504 gateway errors Learndot's proxy occasionally returns.
+RETRYABLE_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+#: How many email addresses to send per bulk contact search request.
+CONTACT_SEARCH_BATCH_SIZE = 100
+
+#: Upper bound on the client's in-process ID memos. Long-lived clients
+#: (like the per-worker one in edxlearndot.tasks) would otherwise grow
+#: them forever and never revisit the TTL'd Django cache entries.
+CLIENT_MEMO_MAX_ENTRIES = 1024
+
+#: How long to cache resolved contact IDs. A user's contact
+#: effectively never changes, so this can be generous; it mostly
+#: bounds staleness after manual fixes on the Learndot side.
+LEARNDOT_CONTACT_CACHE_TIMEOUT = getattr(settings, 'LEARNDOT_CONTACT_CACHE_TIMEOUT_SECONDS', 24 * 3600)
+
+#: How long to cache resolved enrolment IDs. Kept much shorter than
+#: the contact TTL, since enrolments are cancelled and re-created in
+#: the course of normal Learndot administration.
+LEARNDOT_ENROLMENT_CACHE_TIMEOUT = getattr(settings, 'LEARNDOT_ENROLMENT_CACHE_TIMEOUT_SECONDS', 900)
+
+#: How long to cache the fact that a lookup found nothing. Kept short,
+#: since missing contacts and enrolments are usually created soon after.
+LEARNDOT_NEGATIVE_CACHE_TIMEOUT = getattr(settings, 'LEARNDOT_NEGATIVE_CACHE_TIMEOUT_SECONDS', 900)
 
-    Compare the two objects x and y and return an integer according
-    to the outcome.
+#: Cached in place of an ID when a lookup found nothing, so reruns
+#: don't re-query Learndot for users known to have no contact or
+#: enrolment. Distinguishable from a cache miss, which returns None.
+MISSING_ID_SENTINEL = "missing"
 
-    The return value is:
-        - negative if x < y
-        - zero if x == y
-        - strictly positive if x > y
+#: Passed as `known_status` when the caller prefetched the status log
+#: and found no row for the enrolment. Distinguishable from None, which
+#: means the caller didn't prefetch and the client should look the
+#: status up itself.
+NO_LOGGED_STATUS = object()
+
+# The retrying library's wait function can't see the exception that
+# triggered the retry, so retry_match stashes any server-specified
+# Retry-After delay here for the retry wait function to pick up.
+_retry_state = threading.local()
+
+
+def learndot_retry(max_attempts=None, wait_seconds=None, backoff_cap_seconds=None):
     """
-    return (a > b) - (a < b)
+    Build a retry decorator for Learndot API methods.
+
+    The wait schedule honors a server-specified Retry-After delay when
+    one was sent; otherwise it uses exponential backoff with full
+    jitter — a random wait between zero and min(cap, base * 2^attempt)
+    — so that clients retrying after a 429 storm don't all hammer
+    Learndot again in lockstep.
+
+    Any argument left as None falls back to the corresponding Django
+    setting, read when the retry policy runs rather than at module
+    import, so the policy can be tuned per environment; passing
+    explicit values allows per-method tuning.
+    """
+    def wait_func(attempt_number, delay_since_first_attempt_ms):  # pylint: disable=unused-argument
+        retry_after = getattr(_retry_state, "retry_after", None)
+        _retry_state.retry_after = None
+        if retry_after is not None:
+            return retry_after * 1000
+        base = wait_seconds
+        if base is None:
+            base = getattr(settings, 'LEARNDOT_RETRY_WAIT_SECONDS', DEFAULT_RETRY_WAIT_SECONDS)
+        cap = backoff_cap_seconds
+        if cap is None:
+            cap = getattr(settings, 'LEARNDOT_RETRY_BACKOFF_CAP_SECONDS', DEFAULT_RETRY_BACKOFF_CAP_SECONDS)
+        return random.uniform(0, min(cap * 1000, base * 1000 * 2 ** attempt_number))
+
+    def stop_func(attempt_number, delay_since_first_attempt_ms):  # pylint: disable=unused-argument
+        attempts = max_attempts
+        if attempts is None:
+            attempts = getattr(settings, 'LEARNDOT_RETRY_MAX_ATTEMPTS', DEFAULT_RETRY_MAX_ATTEMPTS)
+        if attempt_number >= attempts:
+            # wait_func won't run after the final attempt, so drop any
+            # Retry-After stashed for it; otherwise it would linger on
+            # the thread-local and skew a later call's first wait
+            _retry_state.retry_after = None
+            return True
+        return False
+
+    return retry(
+        retry_on_exception=LearndotAPIException.retry_match,
+        wait_func=wait_func,
+        stop_func=stop_func,
+    )
+
 
 class LearndotAPIException(Exception):
     """
@@ -61,16 +153,71 @@ class LearndotAPIException(Exception):
         """
         Return True to indicate that we should retry on these API errors:
             429 Too Many Requests
+            502 Bad Gateway
+            503 Service Unavailable
             504 Gateway Timeout
+
+        _check_response raises LearndotRateLimitException for every
+        status in RETRYABLE_STATUS_CODES, so matching on the type
+        covers them all.
         """
-        str_e = str(exception)
-        if (isinstance(exception, cls) and (
-                ("429" in str_e) or ("504" in str_e) or ("502" in str_e))):
+        if isinstance(exception, LearndotRateLimitException):
+            _retry_state.retry_after = exception.retry_after
             log.warning("Retrying...")
             return True
         return False
 
 
+class LearndotRateLimitException(LearndotAPIException):
+    """
+    Raised when Learndot asks us to back off with a retryable status.
+
+    Carries the delay from the response's Retry-After header, if the
+    server sent one, so the retry policy can wait exactly that long.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super(LearndotRateLimitException, self).__init__(message)
+        self.retry_after = retry_after
+
+
+#: Sorts after any real ISO8601 date string, so enrolments missing a
+#: date end up last when key tuples are compared lexicographically.
+MISSING_DATE_SENTINEL = "\uffff"
+
+
+#: Sorts after any real date, so enrolments missing a date end up last
+#: when key tuples of datetimes are compared.
+MISSING_DATE_DATETIME = datetime.max
+
+
+@lru_cache(maxsize=4096)
+def _parse_enrolment_date(ds):
+    """
+    Parse one Learndot date string into a naive datetime.
+
+    Learndot timestamps repeat heavily across the enrolments in one
+    API response, so parses are memoized per distinct string. Callers
+    short-circuit empty values before calling, and failed parses are
+    not cached, so the error behaviour below is unchanged.
+
+    Raises:
+        ValueError: if the date can't be parsed
+        OverflowError: if the date can't be fit into the largest valid C integer
+    """
+    try:
+        # fromisoformat is a C-level fast path, and handles the
+        # ISO8601 timestamps Learndot actually returns; fall back
+        # to the much slower dateutil parser for anything else.
+        dt = datetime.fromisoformat(ds.replace(" ", "T").replace("Z", "+00:00"))
+    except ValueError:
+        dt = dateutil.parser.parse(ds)
+    if dt.tzinfo is not None:
+        # normalize to naive UTC so keys stay mutually comparable
+        dt = dt.replace(tzinfo=None) - dt.utcoffset()
+    return dt
+
+
 def extract_enrolment_sort_key(e):
     """
     Return a key for sorting enrolments.
@@ -79,28 +226,33 @@ def extract_enrolment_sort_key(e):
     the first component of the key. It is possible for enrolments to
     lack ``expiryDate``, if the associated component doesn't have
     ``expiryDays`` set. In this case, we'll fall back to sorting by
-    the enrolment's ``modified`` date, then to its ``created`` date,
-    or if those are somehow missing, an empty string.
+    the enrolment's ``modified`` date, then to its ``created`` date.
+    Missing dates are represented by `MISSING_DATE_DATETIME`, which
+    sorts after any real date, so that enrolments without an expiry
+    date sort after those that expire.
+
+    Each date is parsed exactly once, and the resulting datetime
+    tuples compare in C with no per-field Python branching.
 
     Arguments:
         e: a dict parsed from a Learndot JSON enrolment
 
     Returns:
-        key: a tuple of (expiryDate, modified or created or "")
+        key: a tuple of (expiryDate, modified or created) as datetimes,
+            with missing components replaced by `MISSING_DATE_DATETIME`
 
     Raises:
         ValueError: if an expiry date can't be parsed
         OverflowError: if an expiry date can't be fit into the largest valid C integer
     """
 
-    key = (e.get("expiryDate") or "", e.get("modified") or e.get("created") or "")
-
-    # validate each date string if not empty
-    for ds in key:
-        if ds != "":
-            dateutil.parser.parse(ds)
+    expiry = e.get("expiryDate")
+    fallback = e.get("modified") or e.get("created")
 
-    return key
+    return (
+        _parse_enrolment_date(expiry) if expiry else MISSING_DATE_DATETIME,
+        _parse_enrolment_date(fallback) if fallback else MISSING_DATE_DATETIME,
+    )
 
 
 def compare_enrolment_sort_keys(t1, t2):
@@ -118,43 +270,15 @@ def compare_enrolment_sort_keys(t1, t2):
         -1 if t1 < t2, 1 if t1 > t2, or 0 if they're equal
     """
 
-    t1l = len(t1)
-    t2l = len(t2)
-    for i in range(max(t1l, t2l)):
-        ds1 = t1[i] if i < t1l else ""
-        ds2 = t2[i] if i < t2l else ""
-
-        if ds1 == "" and ds2 != "":
-            return 1
-        elif ds1 != "" and ds2 == "":
-            return -1
-        else:
-            r = cmp(ds1, ds2)
-            if r != 0:
-                return r
-
-    return 0
-
-
-def extract_and_compare_enrolment_sort_keys(enrolment1, enrolment2):
-    """
-    Extracts key for sorting enrolments then compares those enrolment keys
-
-    This function is a combination of both `compare_enrolment_sort_keys` and
-    `extract_enrolment_sort_key` such that it can be used with `functools.cmp_to_key`
-
-    Arguments:
-        enrolment1: a dict parsed from a Learndot JSON enrolment
-        enrolment2: a dict parsed from a Learndot JSON enrolment
+    # Normalize empty components to the sentinel and pad the shorter
+    # tuple with it, then let CPython compare the tuples in C rather
+    # than looping over the fields in Python.
+    width = max(len(t1), len(t2))
+    n1 = tuple(ds or MISSING_DATE_SENTINEL for ds in t1) + (MISSING_DATE_SENTINEL,) * (width - len(t1))
+    n2 = tuple(ds or MISSING_DATE_SENTINEL for ds in t2) + (MISSING_DATE_SENTINEL,) * (width - len(t2))
 
-    Returns:
-        Output of `compare_enrolment_sort_keys`, which is
-        -1 if t1 < t2, 1 if t1 > t2, or 0 if they're equal
-    """
-    enrolment1_expiry = extract_enrolment_sort_key(enrolment1)
-    enrolment2_expiry = extract_enrolment_sort_key(enrolment2)
+    return (n1 > n2) - (n1 < n2)
 
-    return compare_enrolment_sort_keys(enrolment1_expiry, enrolment2_expiry)
 
 def sort_enrolments_by_expiry(enrolment_list):
     """
@@ -177,7 +301,19 @@ def sort_enrolments_by_expiry(enrolment_list):
         ValueError: if a sorting date can't be parsed
         OverflowError: if a sorting date can't be fit into the largest valid C integer
     """
-    return sorted(enrolment_list, key=functools.cmp_to_key(extract_and_compare_enrolment_sort_keys))
+    keys = [extract_enrolment_sort_key(e) for e in enrolment_list]
+
+    # the API frequently returns results already in expiry order; in
+    # that common case an O(n) scan replaces the sort entirely
+    if all(k1 <= k2 for k1, k2 in zip(keys, keys[1:])):
+        return list(enrolment_list)
+
+    # reuse the keys computed above rather than extracting them again
+    # with key=; the index keeps the sort stable and stops ties from
+    # falling through to comparing the enrolment dicts themselves
+    decorated = list(zip(keys, range(len(keys)), enrolment_list))
+    decorated.sort()
+    return [enrolment for _key, _index, enrolment in decorated]
 
 
 class EnrolmentStatus:
@@ -203,49 +339,130 @@ class EnrolmentStatus:
 class LearndotAPIClient:
     """
     Client for the live Learndot API.
+
+    The API key, base URL, request headers, and search URLs never
+    change over the life of a client, so they're resolved once and
+    cached on the instance rather than re-read from settings on every
+    API call.
     """
 
+    def __init__(self):
+        self._api_key = None
+        self._api_base_url = None
+        self._api_request_headers = None
+        self._contact_search_url = None
+        self._enrolment_search_url = None
+
+        # Process-local memos of resolved IDs, consulted before the
+        # Django cache, so a long command run never pays even a
+        # cache-backend round trip for a user or contact it has
+        # already seen. Bounded to CLIENT_MEMO_MAX_ENTRIES (see
+        # _memo_set) so a long-lived client can't grow them forever or
+        # indefinitely shadow the cache's TTLs.
+        self._contact_ids = {}
+        self._enrolment_ids = {}
+
+        # Reuse one pooled session for all API calls, so repeated
+        # requests to Learndot share keep-alive connections instead of
+        # paying a TCP + TLS handshake each time.
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=50)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _post(self, url, payload):
+        """
+        POST a JSON payload to the API over the pooled session.
+
+        Uses orjson to encode the payload when it's installed; the
+        stdlib encoder in requests otherwise.
+        """
+        if orjson is not None:
+            return self._session.post(url, headers=self.get_api_request_headers(), data=orjson.dumps(payload))
+        return self._session.post(url, headers=self.get_api_request_headers(), json=payload)
+
+    @staticmethod
+    def _parse_json(response):
+        """
+        Parse a JSON response body, with orjson when it's installed.
+        """
+        if orjson is not None:
+            return orjson.loads(response.content)
+        return response.json()
+
+    @staticmethod
+    def _check_response(response, context):
+        """
+        Raise the appropriate exception for an API error response.
+
+        Retryable statuses raise LearndotRateLimitException, carrying
+        the Retry-After delay if the server specified one; any other
+        HTTP error raises a plain LearndotAPIException.
+        """
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                retry_after = int(retry_after) if retry_after is not None else None
+            except ValueError:
+                # Retry-After can also be an HTTP date; not worth
+                # parsing, just fall back to the backoff schedule.
+                retry_after = None
+            msg = "{}: {} {}".format(context, response.status_code, response.reason)
+            log.error(msg)
+            raise LearndotRateLimitException(msg, retry_after=retry_after)
+
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            msg = "{}: {}".format(context, e)
+            log.error(msg)
+            raise LearndotAPIException(msg) from e
+
     def get_api_key(self):
         """
         Returns the API key for the Learndot v2 API.
         """
-        try:
-            return settings.LEARNDOT_API_KEY
-        except AttributeError as attr_error:
-            msg = (
-                "The Learndot API key could not be found in your Django settings. "
-                "Please add it as settings.LEARNDOT_API_KEY."
-            )
-            log.fatal(msg)
-            raise LearndotAPIException(msg) from attr_error
+        if self._api_key is None:
+            try:
+                self._api_key = settings.LEARNDOT_API_KEY
+            except AttributeError as attr_error:
+                msg = (
+                    "The Learndot API key could not be found in your Django settings. "
+                    "Please add it as settings.LEARNDOT_API_KEY."
+                )
+                log.fatal(msg)
+                raise LearndotAPIException(msg) from attr_error
+        return self._api_key
 
     def get_api_base_url(self):
         """
         Returns the base URL for the Learndot v2 API.
         """
-        try:
-            return settings.LEARNDOT_API_BASE_URL
-        except AttributeError as attr_error:
-            msg = (
-                "The Learndot API base URL could not be found in your Django settings. "
-                "Please add it as settings.LEARNDOT_API_BASE_URL."
-            )
-            log.fatal(msg)
-            raise LearndotAPIException(msg) from attr_error
+        if self._api_base_url is None:
+            try:
+                self._api_base_url = settings.LEARNDOT_API_BASE_URL
+            except AttributeError as attr_error:
+                msg = (
+                    "The Learndot API base URL could not be found in your Django settings. "
+                    "Please add it as settings.LEARNDOT_API_BASE_URL."
+                )
+                log.fatal(msg)
+                raise LearndotAPIException(msg) from attr_error
+        return self._api_base_url
 
     def get_api_request_headers(self):
         """
         Returns the headers required for v2 API calls.
         """
-        return {
-            "TrainingRocket-Authorization": self.get_api_key(),
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-
-    @retry(retry_on_exception=LearndotAPIException.retry_match,
-           wait_fixed=LEARNDOT_RETRY_WAIT,
-           stop_max_attempt_number=LEARNDOT_RETRY_MAX_ATTEMPTS)
+        if self._api_request_headers is None:
+            self._api_request_headers = {
+                "TrainingRocket-Authorization": self.get_api_key(),
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            }
+        return self._api_request_headers
+
+    @learndot_retry()
     def get_contact_id(self, user):
         """
         Tries to look up a Learndot contact using the edX user record.
@@ -265,28 +482,26 @@ class LearndotAPIClient:
 
         contact_query = {"email": [user.email]}
 
-        hashed_email = hashlib.md5(user.email.encode('utf-8')).hexdigest()
-        contact_cache_key = 'edxlearndot-contact-{}-{}'.format(hashed_email, user.id)
+        if user.id in self._contact_ids:
+            log.info("Using cached contact ID %s", self._contact_ids[user.id])
+            return self._contact_ids[user.id]
+
+        contact_cache_key = self._contact_cache_key(user)
 
         cached_contact_id = cache.get(contact_cache_key)
+        if cached_contact_id == MISSING_ID_SENTINEL:
+            log.info("Learndot contact for user %s recently found missing; skipping lookup.", user)
+            return None
         if cached_contact_id is not None:
             log.info("Using cached contact ID %s", cached_contact_id)
+            self._memo_set(self._contact_ids, user.id, cached_contact_id)
             return cached_contact_id
 
-        response = requests.post(
-            self.get_contact_search_url(),
-            headers=self.get_api_request_headers(),
-            json=contact_query
-        )
+        response = self._post(self.get_contact_search_url(), contact_query)
 
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            msg = "Error looking up Learndot contact for user {}: {}".format(user, e)
-            log.error(msg)
-            raise LearndotAPIException(msg) from e
+        self._check_response(response, "Error looking up Learndot contact for user {}".format(user))
 
-        contacts = response.json()["results"]
+        contacts = self._parse_json(response)["results"]
         contact_id = None
 
         # Learndot API query doesn't use exact matching, so filter out any contacts whose emails don't match.
@@ -301,21 +516,128 @@ class LearndotAPIClient:
 
         if contact_id is not None:
             log.info("Caching Learndot contact ID %s for user %s", contact_id, user)
-            cache.set(contact_cache_key, contact_id)
+            self._memo_set(self._contact_ids, user.id, contact_id)
+            cache.set(contact_cache_key, contact_id, timeout=LEARNDOT_CONTACT_CACHE_TIMEOUT)
+        elif not contacts:
+            cache.set(contact_cache_key, MISSING_ID_SENTINEL, timeout=LEARNDOT_NEGATIVE_CACHE_TIMEOUT)
 
         return contact_id
 
+    @learndot_retry()
+    def get_contact_ids_bulk(self, users):
+        """
+        Looks up Learndot contacts for many edX users at once.
+
+        The contact search endpoint accepts a list of email addresses,
+        so users who aren't already cached are resolved in batches of
+        `CONTACT_SEARCH_BATCH_SIZE` rather than one request each.
+
+        Arguments:
+            users: an iterable of django.contrib.auth.models.User
+
+        Returns:
+            dict: a map of user ID to numeric Learndot contact ID,
+                omitting users with no single matching contact.
+
+        Raises:
+            LearndotAPIException: if Requests throws anything.
+        """
+        users = list(users)
+        contact_ids = {}
+
+        # one round trip to the cache backend for the whole batch,
+        # instead of a get per user
+        cache_keys = {user: self._contact_cache_key(user) for user in users}
+        cached = cache.get_many(cache_keys.values())
+
+        uncached_users = []
+        for user in users:
+            cached_contact_id = cached.get(cache_keys[user])
+            if cached_contact_id == MISSING_ID_SENTINEL:
+                continue
+            if cached_contact_id is not None:
+                contact_ids[user.id] = cached_contact_id
+            else:
+                uncached_users.append(user)
+
+        log.info(
+            "Looking up Learndot contacts for %s users (%s already cached).",
+            len(uncached_users),
+            len(users) - len(uncached_users),
+        )
+
+        for start in range(0, len(uncached_users), CONTACT_SEARCH_BATCH_SIZE):
+            batch = uncached_users[start:start + CONTACT_SEARCH_BATCH_SIZE]
+
+            response = self._post(self.get_contact_search_url(), {"email": [user.email for user in batch]})
+
+            self._check_response(response, "Error looking up Learndot contacts in bulk")
+
+            # Learndot API query doesn't use exact matching, so group
+            # the contacts by email and match each user up exactly.
+            contacts_by_email = collections.defaultdict(list)
+            for contact in self._parse_json(response)["results"]:
+                contacts_by_email[contact["email"]].append(contact)
+
+            newly_resolved = {}
+            newly_missing = {}
+            for user in batch:
+                contacts = contacts_by_email.get(user.email, [])
+                if len(contacts) == 1:
+                    contact_id = contacts[0]["id"]
+                    contact_ids[user.id] = contact_id
+                    newly_resolved[cache_keys[user]] = contact_id
+                elif len(contacts) > 1:
+                    surfeit = {c["id"]: (c["_displayName_"], c["email"]) for c in contacts}
+                    log.error("Multiple Learndot contacts found for user %s: %s", user, surfeit)
+                else:
+                    newly_missing[cache_keys[user]] = MISSING_ID_SENTINEL
+
+            if newly_resolved:
+                cache.set_many(newly_resolved, timeout=LEARNDOT_CONTACT_CACHE_TIMEOUT)
+            if newly_missing:
+                cache.set_many(newly_missing, timeout=LEARNDOT_NEGATIVE_CACHE_TIMEOUT)
+
+        return contact_ids
+
+    @staticmethod
+    def _memo_set(memo, key, value):
+        """
+        Insert into an in-process ID memo, keeping it bounded.
+
+        Dicts iterate in insertion order, so the eviction is FIFO; once
+        entries churn out, lookups fall back to the Django cache and
+        pick up its TTLs again.
+        """
+        memo[key] = value
+        while len(memo) > CLIENT_MEMO_MAX_ENTRIES:
+            del memo[next(iter(memo))]
+
+    @staticmethod
+    def _contact_cache_key(user):
+        """
+        Returns the cache key for a user's Learndot contact ID.
+
+        The user ID alone is unique; hashing the email into the key
+        bought nothing but an MD5 per lookup.
+        """
+        return 'edxlearndot-contact-{}'.format(user.id)
+
     def get_contact_search_url(self):
         """
         Returns the URL used to find contacts.
         """
-        return os.path.join(self.get_api_base_url(), "api/rest/v2/manage/contact/search")
+        if self._contact_search_url is None:
+            self._contact_search_url = os.path.join(self.get_api_base_url(), "api/rest/v2/manage/contact/search")
+        return self._contact_search_url
 
     def get_enrolment_search_url(self):
         """
         Returns the URL used to find enrolments.
         """
-        return os.path.join(self.get_api_base_url(), "api/rest/v2/manage/enrolment/search")
+        if self._enrolment_search_url is None:
+            self._enrolment_search_url = os.path.join(self.get_api_base_url(), "api/rest/v2/manage/enrolment/search")
+        return self._enrolment_search_url
 
     def get_enrolment_management_url(self, enrolment_id):
         """
@@ -329,9 +651,7 @@ class LearndotAPIClient:
             "api/rest/v2/manage/enrolment/{}".format(enrolment_id)
         )
 
-    @retry(retry_on_exception=LearndotAPIException.retry_match,
-           wait_fixed=LEARNDOT_RETRY_WAIT,
-           stop_max_attempt_number=LEARNDOT_RETRY_MAX_ATTEMPTS)
+    @learndot_retry()
     def get_enrolment_id(self, contact_id, component_id):
         """
         Fetches the most recent Learndot enrolment record.
@@ -354,11 +674,23 @@ class LearndotAPIClient:
 
         log.info("Looking up Learndot enrolment for contact %s, component %s.", contact_id, component_id)
 
-        enrolment_cache_key = 'edxlearndot-enrolment-{}-{}'.format(contact_id, component_id)
+        if (contact_id, component_id) in self._enrolment_ids:
+            log.info("Using cached enrolment ID %s", self._enrolment_ids[(contact_id, component_id)])
+            return self._enrolment_ids[(contact_id, component_id)]
+
+        enrolment_cache_key = self._enrolment_cache_key(contact_id, component_id)
 
         cached_enrolment_id = cache.get(enrolment_cache_key)
+        if cached_enrolment_id == MISSING_ID_SENTINEL:
+            log.info(
+                "Learndot enrolment for contact %s, component %s recently found missing; skipping lookup.",
+                contact_id,
+                component_id
+            )
+            return None
         if cached_enrolment_id is not None:
             log.info("Using cached enrolment ID %s", cached_enrolment_id)
+            self._memo_set(self._enrolment_ids, (contact_id, component_id), cached_enrolment_id)
             return cached_enrolment_id
 
         enrolment_query = {
@@ -366,59 +698,242 @@ class LearndotAPIClient:
             "componentId": [component_id]
         }
 
-        response = requests.post(
-            self.get_enrolment_search_url(),
-            headers=self.get_api_request_headers(),
-            json=enrolment_query
+        response = self._post(self.get_enrolment_search_url(), enrolment_query)
+        self._check_response(
+            response,
+            "Error looking up Learndot enrolment for contact {}, component {}".format(contact_id, component_id)
         )
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            msg = "Error looking up Learndot enrolment for contact {}, component {}: {}".format(
-                contact_id,
-                component_id,
-                e
-            )
-            log.error(msg)
-            raise LearndotAPIException(msg) from e
 
-        enrolments = [e for e in response.json()["results"] if e["status"] != "CANCELLED"]
-        enrolment_id = None
-        if len(enrolments) == 1:
-            enrolment_id = enrolments[0]["id"]
-        elif len(enrolments) > 1:
-            try:
-                enrolment_id = sort_enrolments_by_expiry(enrolments)[-1]["id"]
-                log.info(
-                    (
-                        "Multiple enrolments exist for contact %s, component %s. "
-                        "Choosing the one with the latest expiry date: %s"
-                    ),
-                    contact_id,
-                    component_id,
-                    enrolment_id
-                )
-            except (ValueError, OverflowError) as e:
-                msg = (
-                    "Multiple enrolments exist for contact {}, component {}, but they could not be sorted "
-                    "by expiry date to determine the latest one. The error raised while sorting was: {}"
-                ).format(contact_id, component_id, e)
-                log.error(msg)
-                raise LearndotAPIException(msg) from e
+        enrolments = [e for e in self._parse_json(response)["results"] if e["status"] != "CANCELLED"]
+        enrolment_id = self._pick_latest_enrolment(enrolments, contact_id, component_id)
 
         if enrolment_id is not None:
             log.info(
                 "Caching Learndot enrolment ID %s for contact %s, component %s",
                 enrolment_id, contact_id, component_id
             )
-            cache.set(enrolment_cache_key, enrolment_id)
+            self._memo_set(self._enrolment_ids, (contact_id, component_id), enrolment_id)
+            cache.set(enrolment_cache_key, enrolment_id, timeout=LEARNDOT_ENROLMENT_CACHE_TIMEOUT)
+        elif not enrolments:
+            cache.set(enrolment_cache_key, MISSING_ID_SENTINEL, timeout=LEARNDOT_NEGATIVE_CACHE_TIMEOUT)
 
         return enrolment_id
 
-    @retry(retry_on_exception=LearndotAPIException.retry_match,
-           wait_fixed=LEARNDOT_RETRY_WAIT,
-           stop_max_attempt_number=LEARNDOT_RETRY_MAX_ATTEMPTS)
-    def set_enrolment_status(self, enrolment_id, status, unconditional=False):
+    @learndot_retry()
+    def get_enrolment_ids_bulk(self, contact_ids, component_id):
+        """
+        Fetches the most recent Learndot enrolments for many contacts.
+
+        All the contacts share a single component ID, so one search
+        request covers every (contact, component) pair; the results are
+        grouped by contact client-side and the latest enrolment picked
+        per contact, exactly as `get_enrolment_id` does for one.
+
+        Arguments:
+            contact_ids: an iterable of numeric Learndot contact IDs.
+            component_id (int): the numeric Learndot component ID.
+
+        Returns:
+            dict: a map of contact ID to numeric Learndot enrolment ID,
+                omitting contacts with no uncancelled enrolment.
+
+        Raises:
+            LearndotAPIException: if multiple enrollments were found for
+                a contact, but could not be sorted so that the latest
+                one could be determined.
+        """
+        contact_ids = list(contact_ids)
+        enrolment_ids = {}
+
+        # one round trip to the cache backend for the whole batch,
+        # instead of a get per contact
+        cache_keys = {
+            contact_id: self._enrolment_cache_key(contact_id, component_id)
+            for contact_id in contact_ids
+        }
+        cached = cache.get_many(cache_keys.values())
+
+        uncached_contact_ids = []
+        for contact_id in contact_ids:
+            cached_enrolment_id = cached.get(cache_keys[contact_id])
+            if cached_enrolment_id == MISSING_ID_SENTINEL:
+                continue
+            if cached_enrolment_id is not None:
+                enrolment_ids[contact_id] = cached_enrolment_id
+            else:
+                uncached_contact_ids.append(contact_id)
+
+        log.info(
+            "Looking up Learndot enrolments for %s contacts, component %s (%s already cached).",
+            len(uncached_contact_ids),
+            component_id,
+            len(contact_ids) - len(uncached_contact_ids),
+        )
+
+        if not uncached_contact_ids:
+            return enrolment_ids
+
+        enrolment_query = {
+            "contactId": uncached_contact_ids,
+            "componentId": [component_id]
+        }
+
+        response = self._post(self.get_enrolment_search_url(), enrolment_query)
+        self._check_response(
+            response,
+            "Error looking up Learndot enrolments for component {}".format(component_id)
+        )
+
+        enrolments_by_contact = collections.defaultdict(list)
+        for enrolment in self._parse_json(response)["results"]:
+            if enrolment["status"] != "CANCELLED":
+                enrolments_by_contact[enrolment["contactId"]].append(enrolment)
+
+        newly_resolved = {}
+        newly_missing = {}
+        for contact_id in uncached_contact_ids:
+            enrolments = enrolments_by_contact.get(contact_id, [])
+            enrolment_id = self._pick_latest_enrolment(enrolments, contact_id, component_id)
+            if enrolment_id is not None:
+                enrolment_ids[contact_id] = enrolment_id
+                newly_resolved[cache_keys[contact_id]] = enrolment_id
+            elif not enrolments:
+                newly_missing[cache_keys[contact_id]] = MISSING_ID_SENTINEL
+
+        if newly_resolved:
+            cache.set_many(newly_resolved, timeout=LEARNDOT_ENROLMENT_CACHE_TIMEOUT)
+        if newly_missing:
+            cache.set_many(newly_missing, timeout=LEARNDOT_NEGATIVE_CACHE_TIMEOUT)
+
+        return enrolment_ids
+
+    @learndot_retry()
+    def find_enrolments_bulk(self, contact_id, component_ids):
+        """
+        Fetches the most recent enrolments for one contact across components.
+
+        The transpose of `get_enrolment_ids_bulk`: one search request
+        covers every (contact, component) pair for a single contact, so
+        a learner passing a course mapped to several components costs
+        one API call instead of one per component.
+
+        Arguments:
+            contact_id (int): the numeric Learndot contact ID.
+            component_ids: an iterable of numeric Learndot component IDs.
+
+        Returns:
+            dict: a map of component ID to numeric Learndot enrolment ID,
+                omitting components with no uncancelled enrolment.
+
+        Raises:
+            LearndotAPIException: if multiple enrollments were found for
+                a component, but could not be sorted so that the latest
+                one could be determined.
+        """
+        component_ids = list(component_ids)
+        enrolment_ids = {}
+
+        cache_keys = {
+            component_id: self._enrolment_cache_key(contact_id, component_id)
+            for component_id in component_ids
+        }
+        cached = cache.get_many(cache_keys.values())
+
+        uncached_component_ids = []
+        for component_id in component_ids:
+            cached_enrolment_id = cached.get(cache_keys[component_id])
+            if cached_enrolment_id == MISSING_ID_SENTINEL:
+                continue
+            if cached_enrolment_id is not None:
+                enrolment_ids[component_id] = cached_enrolment_id
+            else:
+                uncached_component_ids.append(component_id)
+
+        if not uncached_component_ids:
+            return enrolment_ids
+
+        enrolment_query = {
+            "contactId": [contact_id],
+            "componentId": uncached_component_ids
+        }
+
+        response = self._post(self.get_enrolment_search_url(), enrolment_query)
+        self._check_response(
+            response,
+            "Error looking up Learndot enrolments for contact {}".format(contact_id)
+        )
+
+        enrolments_by_component = collections.defaultdict(list)
+        for enrolment in self._parse_json(response)["results"]:
+            if enrolment["status"] != "CANCELLED":
+                enrolments_by_component[enrolment["componentId"]].append(enrolment)
+
+        newly_resolved = {}
+        newly_missing = {}
+        for component_id in uncached_component_ids:
+            enrolments = enrolments_by_component.get(component_id, [])
+            enrolment_id = self._pick_latest_enrolment(enrolments, contact_id, component_id)
+            if enrolment_id is not None:
+                enrolment_ids[component_id] = enrolment_id
+                newly_resolved[cache_keys[component_id]] = enrolment_id
+            elif not enrolments:
+                newly_missing[cache_keys[component_id]] = MISSING_ID_SENTINEL
+
+        if newly_resolved:
+            cache.set_many(newly_resolved, timeout=LEARNDOT_ENROLMENT_CACHE_TIMEOUT)
+        if newly_missing:
+            cache.set_many(newly_missing, timeout=LEARNDOT_NEGATIVE_CACHE_TIMEOUT)
+
+        return enrolment_ids
+
+    @staticmethod
+    def _pick_latest_enrolment(enrolments, contact_id, component_id):
+        """
+        Returns the ID of the latest enrolment in a search result.
+
+        Arguments:
+            enrolments: a list of uncancelled enrolment dicts for one
+                (contact, component) pair.
+
+        Raises:
+            LearndotAPIException: if multiple enrolments could not be
+                sorted by expiry date.
+        """
+        if not enrolments:
+            return None
+
+        if len(enrolments) == 1:
+            return enrolments[0]["id"]
+
+        try:
+            enrolment_id = sort_enrolments_by_expiry(enrolments)[-1]["id"]
+            log.info(
+                (
+                    "Multiple enrolments exist for contact %s, component %s. "
+                    "Choosing the one with the latest expiry date: %s"
+                ),
+                contact_id,
+                component_id,
+                enrolment_id
+            )
+            return enrolment_id
+        except (ValueError, OverflowError) as e:
+            msg = (
+                "Multiple enrolments exist for contact {}, component {}, but they could not be sorted "
+                "by expiry date to determine the latest one. The error raised while sorting was: {}"
+            ).format(contact_id, component_id, e)
+            log.error(msg)
+            raise LearndotAPIException(msg) from e
+
+    @staticmethod
+    def _enrolment_cache_key(contact_id, component_id):
+        """
+        Returns the cache key for a contact's enrolment in a component.
+        """
+        return 'edxlearndot-enrolment-{}-{}'.format(contact_id, component_id)
+
+    @learndot_retry()
+    def set_enrolment_status(self, enrolment_id, status, unconditional=False, known_status=None, record_log=True):
         """
         Sets the status of a Learndot enrollment record.
 
@@ -432,8 +947,22 @@ class LearndotAPIClient:
                                   status to Learndot, instead of checking
                                   EnrolmentStatusLog records to see if it
                                   has already been sent.
+
+            known_status (str): the last status sent to Learndot, if the
+                                caller prefetched it from EnrolmentStatusLog;
+                                saves the per-enrolment lookup that would
+                                otherwise be made here. Callers who
+                                prefetched and found no row should pass
+                                NO_LOGGED_STATUS, which skips the lookup
+                                too; None means "not prefetched".
+
+            record_log (bool): whether to write the EnrolmentStatusLog
+                               record here. Callers updating many
+                               enrolments can pass False and batch the
+                               writes themselves from the return value.
         Returns:
-            None
+            str: the status, if it was sent to Learndot, or None if the
+                update was skipped.
 
         Raises:
             LearndotAPIException: if the requested status is invalid, or
@@ -452,47 +981,58 @@ class LearndotAPIClient:
             raise LearndotAPIException(msg)
 
         if not unconditional:
-            try:
-                enrolment_status = EnrolmentStatusLog.objects.get(learndot_enrolment_id=enrolment_id)
-                if enrolment_status.status == status:
+            if known_status is not None:
+                # NO_LOGGED_STATUS never equals a real status, so a
+                # prefetched "no row" falls through to the push without
+                # hitting the per-enrolment query below
+                if known_status == status:
                     log.info(
-                        "Learndot enrolment was logged as set to %s at %s, so skipping update.",
-                        enrolment_status.status,
-                        enrolment_status.updated_at
+                        "Learndot enrolment %s was already logged as set to %s, so skipping update.",
+                        enrolment_id,
+                        known_status
                     )
-                    return
-            except EnrolmentStatusLog.DoesNotExist:
-                pass
-
-        response = requests.post(
-            self.get_enrolment_management_url(enrolment_id),
-            headers=self.get_api_request_headers(),
-            json={"status": status}
+                    return None
+            else:
+                try:
+                    enrolment_status = EnrolmentStatusLog.objects.get(learndot_enrolment_id=enrolment_id)
+                    if enrolment_status.status == status:
+                        log.info(
+                            "Learndot enrolment was logged as set to %s at %s, so skipping update.",
+                            enrolment_status.status,
+                            enrolment_status.updated_at
+                        )
+                        return None
+                except EnrolmentStatusLog.DoesNotExist:
+                    pass
+
+        response = self._post(self.get_enrolment_management_url(enrolment_id), {"status": status})
+
+        self._check_response(
+            response,
+            "Error trying to set status of enrolment {} to {}".format(enrolment_id, status)
         )
 
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            msg = "Error trying to set status of enrolment {} to {}: {}".format(enrolment_id, status, e)
-            log.error(msg)
-            raise LearndotAPIException(msg) from e
+        if record_log:
+            try:
+                enrolment_status_log, _created = EnrolmentStatusLog.objects.get_or_create(
+                    learndot_enrolment_id=enrolment_id
+                )
+                enrolment_status_log.status = status
+                if status == EnrolmentStatus.PASSED:
+                    enrolment_status_log.passed_at = timezone.now()
+                enrolment_status_log.save()
+                log.info(
+                    "Recorded status of enrolment %s as %s at %s",
+                    enrolment_status_log.learndot_enrolment_id,
+                    enrolment_status_log.status,
+                    enrolment_status_log.updated_at
+                )
+            except (IntegrityError, MultipleObjectsReturned) as e:
+                log.error("Error recording enrolment status update: %s", e)
 
-        try:
-            enrolment_status_log, _created = EnrolmentStatusLog.objects.get_or_create(
-                learndot_enrolment_id=enrolment_id
-            )
-            enrolment_status_log.status = status
-            enrolment_status_log.save()
-            log.info(
-                "Recorded status of enrolment %s as %s at %s",
-                enrolment_status_log.learndot_enrolment_id,
-                enrolment_status_log.status,
-                enrolment_status_log.updated_at
-            )
-        except (IntegrityError, MultipleObjectsReturned) as e:
-            log.error("Error recording enrolment status update: %s", e)
+        return status
 
-    def set_enrolment_status_to_passed(self, enrolment_id, unconditional=False):
+    def set_enrolment_status_to_passed(self, enrolment_id, unconditional=False, known_status=None, record_log=True):
         """
         Sets the status of a Learndot enrollment record to PASSED.
         Arguments:
@@ -501,13 +1041,21 @@ class LearndotAPIClient:
                                   status to Learndot, instead of checking
                                   EnrolmentStatusLog records to see if it
                                   has already been sent.
+            known_status (str): the last status sent to Learndot, if the
+                                caller prefetched it from EnrolmentStatusLog;
+                                see `set_enrolment_status`.
+            record_log (bool): whether to write the EnrolmentStatusLog
+                               record here; see `set_enrolment_status`.
         Returns:
-            None
+            str: the status, if it was sent to Learndot, or None if the
+                update was skipped.
         Raises:
             LearndotAPIException: if the requested status is invalid, or
                 Requests throws anything.
         """
-        self.set_enrolment_status(enrolment_id, EnrolmentStatus.PASSED, unconditional)
+        return self.set_enrolment_status(
+            enrolment_id, EnrolmentStatus.PASSED, unconditional, known_status=known_status, record_log=record_log
+        )
 
     def check_if_enrolment_and_set_status_to_passed(self, contact_id, component_id, unconditional=False):
         """
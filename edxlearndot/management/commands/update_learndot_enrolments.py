@@ -8,26 +8,43 @@ from __future__ import absolute_import, unicode_literals
 
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import dateparser
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
 
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 
-from lms.djangoapps.courseware.courses import get_course
 from lms.djangoapps.grades.config import should_persist_grades
 from lms.djangoapps.grades.course_grade_factory import CourseGradeFactory
+from lms.djangoapps.grades.models import PersistentCourseGrade
 from common.djangoapps.student.models import CourseEnrollment
 
-from edxlearndot.learndot import LearndotAPIClient
-from edxlearndot.models import CourseMapping
+from edxlearndot.learndot import NO_LOGGED_STATUS, EnrolmentStatus, LearndotAPIClient, LearndotAPIException
+from edxlearndot.models import CourseMapping, EnrolmentStatusLog
 
 
 log = logging.getLogger(__name__)
 
 
+def _status_log_entry(enrolment_id, status, now):
+    """
+    Build an EnrolmentStatusLog row recording one pushed status.
+    """
+    return EnrolmentStatusLog(
+        learndot_enrolment_id=enrolment_id,
+        status=status,
+        passed_at=now if status == EnrolmentStatus.PASSED else None,
+        # bulk_update skips auto_now, so set updated_at explicitly
+        updated_at=now,
+    )
+
+
 class Command(BaseCommand):
     """
     Django management command to update Learndot enrolments from edX grades
@@ -109,58 +126,212 @@ class Command(BaseCommand):
         end_enrollments_date = dateparser.parse(options["end"], settings=date_settings)
         start_enrolments_date = dateparser.parse(options["start"], settings=date_settings)
 
-        for cm in course_mappings:
-            try:
-                course = get_course(cm.edx_course_key)
-            except (InvalidKeyError, ValueError):
-                log.error("Invalid edX course found in map: %s", cm.edx_course_key)
+        # stream the mappings from the database rather than caching the
+        # full rowset on the queryset; exists() above already avoided
+        # materializing it early
+        for cm in course_mappings.iterator(chunk_size=500):
+            self.update_course_enrolments(
+                learndot_client, cm, options, start_enrolments_date, end_enrollments_date
+            )
+
+    def update_course_enrolments(self, learndot_client, course_mapping, options, start_date, end_date):
+        """
+        Update the Learndot enrolments for one mapped course.
+        """
+        # bind these once; the body below refers to them many times over
+        course_key = course_mapping.edx_course_key
+        component_id = course_mapping.learndot_component_id
+
+        log.info("Processing enrollments in course %s", course_key)
+
+        # select_related pulls the user rows in with one JOIN,
+        # instead of a SELECT per enrollment.user access below
+        enrollments = CourseEnrollment.objects.filter(
+            course_id=course_key,
+            created__range=[start_date, end_date],
+            is_active=True,
+        ).select_related("user")
+
+        if options["users"]:
+            enrollments = enrollments.filter(user__username__in=options["users"])
+
+        # resolve all the contacts for this course in one batched
+        # search rather than one API call per enrollment
+        enrollments = list(enrollments)
+        if not enrollments:
+            # nothing to do for this course; skip the contact and
+            # grade machinery entirely
+            log.info("No enrollments to process in course %s", course_key)
+            return
+
+        contact_ids = learndot_client.get_contact_ids_bulk(enrollment.user for enrollment in enrollments)
+
+        users_with_contacts = []
+        for enrollment in enrollments:
+            if contact_ids.get(enrollment.user.id):
+                users_with_contacts.append(enrollment.user)
+            else:
+                log.info(
+                    "Not setting enrolment status for user %s in course %s, because contact_id is None .",
+                    enrollment.user,
+                    course_key
+                )
+
+        passing_contact_ids = self.get_passing_contact_ids(course_key, users_with_contacts, contact_ids)
+        if not passing_contact_ids:
+            return
+
+        # all these contacts share the course's component, so one
+        # bulk search resolves every enrolment to update
+        enrolment_ids = learndot_client.get_enrolment_ids_bulk(passing_contact_ids, component_id)
+
+        pending_enrolment_ids = []
+        for contact_id in passing_contact_ids:
+            enrolment_id = enrolment_ids.get(contact_id)
+            if not enrolment_id:
+                log.error("No enrolment found for contact %s, component %s", contact_id, component_id)
                 continue
+            pending_enrolment_ids.append(enrolment_id)
 
-            log.info("Processing enrollments in course %s", cm.edx_course_key)
+        # prefetch the recorded statuses for this batch in one
+        # query, instead of a SELECT per enrolment in the client
+        known_statuses = dict(
+            EnrolmentStatusLog.objects.filter(
+                learndot_enrolment_id__in=pending_enrolment_ids
+            ).values_list("learndot_enrolment_id", "status")
+        )
 
-            enrollments = CourseEnrollment.objects.filter(
-                course_id=cm.edx_course_key,
-                created__range=[start_enrolments_date, end_enrollments_date],
+        # skip enrolments already recorded as PASSED up front, so
+        # they never enter the grade-and-API path at all
+        if not options["unconditional"]:
+            already_passed_count = sum(
+                1 for enrolment_id in pending_enrolment_ids
+                if known_statuses.get(enrolment_id) == EnrolmentStatus.PASSED
             )
+            if already_passed_count:
+                log.info(
+                    "Skipping %s enrolments in course %s already recorded as PASSED.",
+                    already_passed_count,
+                    course_key
+                )
+                pending_enrolment_ids = [
+                    enrolment_id for enrolment_id in pending_enrolment_ids
+                    if known_statuses.get(enrolment_id) != EnrolmentStatus.PASSED
+                ]
 
-            if options["users"]:
-                enrollments = enrollments.filter(user__username__in=options["users"])
+        update_enrolment = partial(
+            self.push_enrolment_status,
+            learndot_client,
+            known_statuses=known_statuses,
+            unconditional=options["unconditional"],
+        )
 
-            for enrollment in enrollments:
-                contact_id = learndot_client.get_contact_id(enrollment.user)
-                if not contact_id:
-                    log.info(
-                        "Not setting enrolment status for user %s in course %s, because contact_id is None .",
-                        enrollment.user,
-                        cm.edx_course_key
-                    )
-                    continue
-                #
-                # Disturbingly enough, if persistent grades are not
-                # enabled, it just takes looking up the grade to get
-                # the Learndot enrolment updated, because when
-                # CourseGradeFactory constructs the CourseGrade in its
-                # read() method, it will actually call its _update()
-                # method, which sends the COURSE_GRADE_NOW_PASSED
-                # signal, which of course fires
-                # edxlearndot.signals.listen_for_passing_grade.
-                #
-                # However, if the edX instance has persistent course
-                # grades enabled, the CourseGrade doesn't have to be
-                # constructed, so the signal isn't fired, and we have
-                # to explicitly update Learndot.
-                #
-                course_grade = CourseGradeFactory().read(enrollment.user, course)
+        # the status updates can't be batched server-side, but they
+        # are independent and I/O-bound, so run them concurrently
+        max_workers = getattr(settings, "LEARNDOT_MAX_CONCURRENCY", 8)
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                statuses = list(executor.map(update_enrolment, pending_enrolment_ids))
+        else:
+            statuses = [update_enrolment(enrolment_id) for enrolment_id in pending_enrolment_ids]
+
+        # record the pushed statuses in one batch of SQL, instead
+        # of a get_or_create + save per enrolment
+        pushed = {
+            enrolment_id: status
+            for enrolment_id, status in zip(pending_enrolment_ids, statuses)
+            if status is not None
+        }
+        if pushed:
+            existing_ids = set(
+                EnrolmentStatusLog.objects.filter(
+                    learndot_enrolment_id__in=pushed
+                ).values_list("learndot_enrolment_id", flat=True)
+            )
+            now = timezone.now()
+            EnrolmentStatusLog.objects.bulk_create([
+                _status_log_entry(enrolment_id, status, now)
+                for enrolment_id, status in pushed.items()
+                if enrolment_id not in existing_ids
+            ])
+            EnrolmentStatusLog.objects.bulk_update(
+                [
+                    _status_log_entry(enrolment_id, status, now)
+                    for enrolment_id, status in pushed.items()
+                    if enrolment_id in existing_ids
+                ],
+                ["status", "passed_at", "updated_at"]
+            )
+
+    @staticmethod
+    def get_passing_contact_ids(course_key, users_with_contacts, contact_ids):
+        """
+        Return the Learndot contact IDs of the users passing a course.
+
+        Disturbingly enough, if persistent grades are not enabled, it
+        just takes looking up the grade to get the Learndot enrolment
+        updated, because when CourseGradeFactory constructs a
+        CourseGrade, it will actually call its _update() method, which
+        sends the COURSE_GRADE_NOW_PASSED signal, which of course
+        fires edxlearndot.signals.listen_for_passing_grade.
+
+        However, if the edX instance has persistent course grades
+        enabled, the CourseGrade doesn't have to be constructed, so
+        the signal isn't fired, and we have to explicitly update
+        Learndot. In that case the passed learners can be read
+        straight from the persistent grade table with one indexed
+        query, with no grade hydration at all.
+        """
+        passing_contact_ids = []
+        if should_persist_grades(course_key):
+            log.info("Grades are persistent; explicitly updating Learndot enrolments.")
+            passed_user_ids = set(
+                PersistentCourseGrade.objects.filter(
+                    course_id=course_key,
+                    user_id__in=[user.id for user in users_with_contacts],
+                    passed_timestamp__isnull=False,
+                ).values_list("user_id", flat=True)
+            )
+            passing_contact_ids = [
+                contact_ids[user.id] for user in users_with_contacts if user.id in passed_user_ids
+            ]
+        else:
+            # reading the grades is enough to fire the signal per
+            # passing learner; iter() does it in one batched pass
+            grade_iterator = CourseGradeFactory().iter(users=users_with_contacts, course_key=course_key)
+            for user, course_grade, _error in grade_iterator:
                 if not course_grade:
                     log.info(
                         "Not setting enrolment status for user %s in course %s, because no grade is available.",
-                        enrollment.user,
-                        cm.edx_course_key
-                    )
-                elif course_grade.passed and should_persist_grades(cm.edx_course_key):
-                    log.info("Grades are persistent; explicitly updating Learndot enrolment.")
-                    learndot_client.check_if_enrolment_and_set_status_to_passed(
-                        contact_id,
-                        cm.learndot_component_id,
-                        unconditional=options["unconditional"]
+                        user,
+                        course_key
                     )
+        return passing_contact_ids
+
+    @staticmethod
+    def push_enrolment_status(learndot_client, enrolment_id, known_statuses, unconditional):
+        """
+        Push one enrolment's PASSED status, returning the pushed status.
+
+        Returns None if the push was skipped or failed; a failure here
+        must not propagate, or the batched status-log write would be
+        discarded along with every other push in the course's batch.
+        """
+        try:
+            return learndot_client.set_enrolment_status_to_passed(
+                enrolment_id,
+                unconditional=unconditional,
+                # NO_LOGGED_STATUS marks "prefetched, no row", so the
+                # client doesn't fall back to a query per enrolment
+                known_status=known_statuses.get(enrolment_id, NO_LOGGED_STATUS),
+                record_log=False
+            )
+        except LearndotAPIException:
+            # retries are exhausted for this enrolment; a rerun will
+            # pick it up again, since nothing gets logged for it
+            log.exception("Failed to set status of enrolment %s to PASSED", enrolment_id)
+            return None
+        finally:
+            # each worker thread may get its own DB connection
+            # for the known-status check; don't leak them
+            close_old_connections()
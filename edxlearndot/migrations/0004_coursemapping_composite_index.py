@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edxlearndot', '0003_auto_20180327_1442'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coursemapping',
+            index=models.Index(
+                fields=['edx_course_key', 'learndot_component_id'],
+                name='edxlearndot_cm_key_comp_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edxlearndot', '0004_coursemapping_composite_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrolmentstatuslog',
+            name='passed_at',
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text='When a PASSED status was last sent to Learndot, if ever.',
+                null=True,
+            ),
+        ),
+    ]
@@ -17,6 +17,15 @@ class CourseMapping(models.Model):
     class Meta:
         app_label = "edxlearndot"
         unique_together = ("learndot_component_id", "edx_course_key")
+        indexes = [
+            # covers the course-key-first lookup the passing-grade
+            # signal makes, which the unique_together index (component
+            # ID first) can't serve
+            models.Index(
+                fields=["edx_course_key", "learndot_component_id"],
+                name="edxlearndot_cm_key_comp_idx",
+            ),
+        ]
 
     def __str__(self):
         return str(self.__unicode__())
@@ -38,6 +47,12 @@ class EnrolmentStatusLog(models.Model):
     status = models.TextField(
         help_text="The last status sent to Learndot."
     )
+    passed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="When a PASSED status was last sent to Learndot, if ever."
+    )
 
     class Meta:
         app_label = "edxlearndot"
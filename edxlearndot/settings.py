@@ -10,18 +10,19 @@ import os
 def plugin_settings(settings):
     """
     The integration requires two settings: an API key and a base URL.
+
+    Each comes from the platform's token dicts when they exist, with
+    the same-named environment variable as the fallback.
     """
 
-    if hasattr(settings, "ENV_TOKENS"):
-        settings.LEARNDOT_API_BASE_URL = settings.ENV_TOKENS.get(
-            "LEARNDOT_API_BASE_URL",
-            os.environ.get("LEARNDOT_API_BASE_URL", "")
-        )
+    env = getattr(settings, "ENV_TOKENS", os.environ)
+    auth = getattr(settings, "AUTH_TOKENS", os.environ)
 
-        settings.LEARNDOT_API_KEY = settings.AUTH_TOKENS.get(
-            "LEARNDOT_API_KEY",
-            os.environ.get("LEARNDOT_API_BASE_URL", "")
-        )
-    else:
-        settings.LEARNDOT_API_BASE_URL = os.environ.get("LEARNDOT_API_BASE_URL", "")
-        settings.LEARNDOT_API_KEY = os.environ.get("LEARNDOT_API_KEY", "")
+    settings.LEARNDOT_API_BASE_URL = env.get(
+        "LEARNDOT_API_BASE_URL",
+        os.environ.get("LEARNDOT_API_BASE_URL", "")
+    )
+    settings.LEARNDOT_API_KEY = auth.get(
+        "LEARNDOT_API_KEY",
+        os.environ.get("LEARNDOT_API_KEY", "")
+    )
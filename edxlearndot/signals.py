@@ -7,8 +7,8 @@ from __future__ import absolute_import, unicode_literals
 
 import logging
 
-from edxlearndot.learndot import LearndotAPIClient
 from edxlearndot.models import CourseMapping
+from edxlearndot.tasks import update_learndot_enrolment
 
 
 log = logging.getLogger(__name__)
@@ -18,8 +18,10 @@ def listen_for_passing_grade(sender, user, course_id, **kwargs):  # pylint: disa
     """
     Listen for a learner passing a course.
 
-    When this happens, use the LearnDot API to complete the user's
-    latest valid enrolment.
+    When this happens, queue a task to use the LearnDot API to
+    complete the user's latest valid enrolment. The remote calls run
+    in the task, so the request that finalized the grade only pays for
+    a local mapping check here.
 
     Arguments:
         user (`django.contrib.auth.models.User`): the edX learner's user object
@@ -30,12 +32,11 @@ def listen_for_passing_grade(sender, user, course_id, **kwargs):  # pylint: disa
 
     """
 
-    log.info("Updating Learndot enrolment for new passing grade: user=%s, course=%s", user, course_id)
+    # Most courses have no Learndot mapping, and this fires for every
+    # passing grade, so bail out with one indexed exists() query before
+    # queuing a task.
+    if not course_id or not CourseMapping.objects.filter(edx_course_key=course_id).exists():
+        return
 
-    learndot_client = LearndotAPIClient()
-    contact_id = learndot_client.get_contact_id(user)
-
-    if contact_id and course_id:
-        course_mappings = CourseMapping.objects.filter(edx_course_key=course_id)
-        for cm in course_mappings:
-            learndot_client.check_if_enrolment_and_set_status_to_passed(contact_id, cm.learndot_component_id)
+    log.info("Queuing Learndot enrolment update for new passing grade: user=%s, course=%s", user, course_id)
+    update_learndot_enrolment.delay(user.id, str(course_id))
@@ -0,0 +1,72 @@
+"""
+Celery tasks for the Learndot integration.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import logging
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+
+from opaque_keys.edx.keys import CourseKey
+
+from edxlearndot.learndot import LearndotAPIClient, LearndotAPIException
+from edxlearndot.models import CourseMapping
+
+
+log = logging.getLogger(__name__)
+
+# One client per worker process, so its pooled keep-alive connections
+# and memoized settings survive across task invocations instead of
+# being rebuilt per passing grade. requests.Session is thread-safe for
+# this usage.
+_CLIENT = LearndotAPIClient()
+
+
+@shared_task(autoretry_for=(LearndotAPIException,), retry_backoff=True, max_retries=3)
+def update_learndot_enrolment(user_id, course_id):
+    """
+    Update the Learndot enrolments for a learner who passed a course.
+
+    This is the work the passing-grade signal handler used to do
+    inline; running it here keeps the web request that finalized the
+    grade from waiting on Learndot latency. The client's own retry
+    policy handles transient API errors within one task run, and the
+    task retries with backoff if the client gives up entirely.
+
+    Arguments:
+        user_id (int): the ID of the edX learner's user record
+        course_id (str): the serialized ID of the passed edX course
+    """
+    user = get_user_model().objects.filter(id=user_id).first()
+    if user is None:
+        log.error("Not updating Learndot enrolments: no user with ID %s", user_id)
+        return
+
+    course_key = CourseKey.from_string(course_id)
+
+    # values_list fetches just the component IDs, skipping the model
+    # instantiation and CourseKey deserialization of full rows; the
+    # composite index serves it without touching the table
+    component_ids = list(
+        CourseMapping.objects.filter(
+            edx_course_key=course_key
+        ).values_list("learndot_component_id", flat=True)
+    )
+    if not component_ids:
+        return
+
+    contact_id = _CLIENT.get_contact_id(user)
+    if not contact_id:
+        return
+
+    # one batched search resolves the enrolments for every mapped
+    # component, instead of one API call per component
+    enrolment_ids = _CLIENT.find_enrolments_bulk(contact_id, component_ids)
+    for component_id in component_ids:
+        enrolment_id = enrolment_ids.get(component_id)
+        if not enrolment_id:
+            log.error("No enrolment found for contact %s, component %s", contact_id, component_id)
+            continue
+        _CLIENT.set_enrolment_status_to_passed(enrolment_id)
@@ -25,6 +25,7 @@ setup(
     ],
     packages=find_packages(include=['edxlearndot', 'edxlearndot.*']),
     install_requires=[
+        "celery",
         "django>=2.2",
         "edx-opaque-keys",
         "dateparser",
@@ -12,6 +12,20 @@ DATABASES = {
         "PASSWORD": "",
         "HOST": "",
         "PORT": "",
+        # keep the test database in memory so per-test transactions
+        # never touch the disk
+        "TEST": {
+            "NAME": ":memory:",
+        },
+    }
+}
+
+# pin the cache to local memory so the cache.clear() calls in test
+# setUp are dict resets, never a network round-trip
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "edxlearndot-tests",
     }
 }
 
@@ -29,3 +43,6 @@ LEARNDOT_API_BASE_URL = 'http://learndot/'
 LEARNDOT_API_KEY = 'abc'
 LEARNDOT_RETRY_WAIT_SECONDS=1
 LEARNDOT_RETRY_MAX_ATTEMPTS=2
+
+# worker threads and the shared in-memory test database don't mix
+LEARNDOT_MAX_CONCURRENCY=1
@@ -4,19 +4,21 @@ Test the Learndot API
 
 from __future__ import absolute_import, unicode_literals
 
+import copy
 import datetime
 import sys
+from types import MappingProxyType
 
 from mock import patch, MagicMock
 import ddt
 import responses
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, tag
 from django.utils import timezone
 
 from edxlearndot.learndot import (
-    EnrolmentStatus, LearndotAPIClient, LearndotAPIException,
+    MISSING_ID_SENTINEL, NO_LOGGED_STATUS, EnrolmentStatus, LearndotAPIClient, LearndotAPIException,
     compare_enrolment_sort_keys, sort_enrolments_by_expiry
 )
 from edxlearndot.models import CourseMapping, EnrolmentStatusLog
@@ -24,65 +26,125 @@ from edxlearndot.models import CourseMapping, EnrolmentStatusLog
 from .utils import LearndotAPIClientMock
 
 
-class TestEnrolmentSorting(TestCase):
-    """
-    Test that lists of enrolments in API results can be sorted properly.
-    """
+#: One mock client for the whole module; tests take a cheap shallow
+#: copy and reset it instead of rebuilding the session per test.
+_CLIENT_PROTOTYPE = LearndotAPIClientMock()
+
+
+#: Enrolment fixtures for the sorting tests, built once at import
+#: instead of on every test run; MappingProxyType keeps them read-only
+#: so the expected orderings can safely share the same objects.
+_EXPIRY_SORT_INPUT = (
+    MappingProxyType({
+        "componentId": 1,
+        "contactId": 1,
+        "expiryDate": "2018-01-31 00:00:00",
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "expiryDate": "2018-01-01 00:00:00",
+    }),
+    MappingProxyType({
+        "componentId": 1,
+        "contactId": 2,
+        "expiryDate": "2018-01-10 00:00:00",
+    }),
+)
 
-    def test_enrolment_expiry_comparator(self):
-        t1 = ("2018-01-01", "2018-02-01")
-        t2 = ("2018-01-01", "2018-02-01", "2018-02-03")
+_EXPIRY_SORT_EXPECTED = (
+    _EXPIRY_SORT_INPUT[1],
+    _EXPIRY_SORT_INPUT[2],
+    _EXPIRY_SORT_INPUT[0],
+)
 
-        self.assertEqual(1, compare_enrolment_sort_keys(t1, t2))
+_MISSING_EXPIRY_INPUT = (
+    MappingProxyType({
+        "componentId": 1,
+        "contactId": 1,
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "expiryDate": "",
+    }),
+    MappingProxyType({
+        "componentId": 3,
+        "contactId": 1,
+        "expiryDate": None,
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "created": "2018-02-01 00:00:00",
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "modified": "2018-01-02 00:00:00",
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "created": "2018-01-01 00:00:00",
+        "modified": "2018-02-02 00:00:00",
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "expiryDate": "2018-03-01 00:00:00",
+    }),
+    MappingProxyType({
+        "componentId": 2,
+        "contactId": 1,
+        "expiryDate": "2018-01-01 00:00:00",
+    }),
+)
 
-        t1 = ("2018-01-01", "2018-02-01")
-        t2 = ("2018-01-01", "2018-02-01")
+_MISSING_EXPIRY_EXPECTED = (
+    _MISSING_EXPIRY_INPUT[7],
+    _MISSING_EXPIRY_INPUT[6],
+    _MISSING_EXPIRY_INPUT[4],
+    _MISSING_EXPIRY_INPUT[3],
+    _MISSING_EXPIRY_INPUT[5],
+    _MISSING_EXPIRY_INPUT[0],
+    _MISSING_EXPIRY_INPUT[1],
+    _MISSING_EXPIRY_INPUT[2],
+)
 
-        self.assertEqual(0, compare_enrolment_sort_keys(t1, t2))
 
-        t1 = ("2018-01-01", "2018-02-01", "2018-03-01")
-        t2 = ("2018-01-01", "2018-02-01")
+@ddt.ddt
+class TestEnrolmentSorting(SimpleTestCase):
+    """
+    Test that lists of enrolments in API results can be sorted properly.
+    """
 
-        self.assertEqual(-1, compare_enrolment_sort_keys(t1, t2))
+    @ddt.data(
+        (("2018-01-01", "2018-02-01"), ("2018-01-01", "2018-02-01", "2018-02-03"), 1),
+        (("2018-01-01", "2018-02-01"), ("2018-01-01", "2018-02-01"), 0),
+        (("2018-01-01", "2018-02-01", "2018-03-01"), ("2018-01-01", "2018-02-01"), -1),
+    )
+    @ddt.unpack
+    def test_enrolment_expiry_comparator(self, t1, t2, expected):
+        self.assertEqual(expected, compare_enrolment_sort_keys(t1, t2))
 
-    def test_enrolments_with_expiry(self):
-        enrolment_list = [
-            {
-                "componentId": 1,
-                "contactId": 1,
-                "expiryDate": "2018-01-31 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "2018-01-01 00:00:00",
-            },
-            {
-                "componentId": 1,
-                "contactId": 2,
-                "expiryDate": "2018-01-10 00:00:00",
-            },
-        ]
+    def assertSameObjectsInOrder(self, actual, expected):
+        """
+        Assert that two lists hold the very same objects in the same order.
 
-        properly_sorted_enrolment_list = [
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "2018-01-01 00:00:00",
-            },
-            {
-                "componentId": 1,
-                "contactId": 2,
-                "expiryDate": "2018-01-10 00:00:00",
-            },
-            {
-                "componentId": 1,
-                "contactId": 1,
-                "expiryDate": "2018-01-31 00:00:00",
-            },
-        ]
+        sort_enrolments_by_expiry reorders the input objects rather than
+        copying them, so identity checks are enough and skip a deep
+        dict-by-dict comparison.
+        """
+        self.assertEqual(len(actual), len(expected))
+        for actual_item, expected_item in zip(actual, expected):
+            self.assertIs(actual_item, expected_item)
 
-        self.assertEqual(sort_enrolments_by_expiry(enrolment_list), properly_sorted_enrolment_list)
+    def test_enrolments_with_expiry(self):
+        self.assertSameObjectsInOrder(
+            sort_enrolments_by_expiry(list(_EXPIRY_SORT_INPUT)),
+            _EXPIRY_SORT_EXPECTED
+        )
 
 
     def test_sort_missing_expiry(self):
@@ -91,95 +153,13 @@ class TestEnrolmentSorting(TestCase):
 
         Enrolments with expiryDates should be first.
         """
-        enrolment_list = [
-            {
-                "componentId": 1,
-                "contactId": 1,
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "",
-            },
-            {
-                "componentId": 3,
-                "contactId": 1,
-                "expiryDate": None,
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "created": "2018-02-01 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "modified": "2018-01-02 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "created": "2018-01-01 00:00:00",
-                "modified": "2018-02-02 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "2018-03-01 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "2018-01-01 00:00:00",
-            },
-        ]
-
-        properly_sorted_enrolment_list = [
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "2018-01-01 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "2018-03-01 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "modified": "2018-01-02 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "created": "2018-02-01 00:00:00",
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "created": "2018-01-01 00:00:00",
-                "modified": "2018-02-02 00:00:00",
-            },
-            {
-                "componentId": 1,
-                "contactId": 1,
-            },
-            {
-                "componentId": 2,
-                "contactId": 1,
-                "expiryDate": "",
-            },
-            {
-                "componentId": 3,
-                "contactId": 1,
-                "expiryDate": None,
-            },
-        ]
-
         self.maxDiff = None
-        self.assertEqual(sort_enrolments_by_expiry(enrolment_list), properly_sorted_enrolment_list)
+        self.assertSameObjectsInOrder(
+            sort_enrolments_by_expiry(list(_MISSING_EXPIRY_INPUT)),
+            _MISSING_EXPIRY_EXPECTED
+        )
 
+    @tag("edgecase")
     def test_sort_bad_expiry_format(self):
         enrolment_list = [
             {
@@ -187,16 +167,12 @@ class TestEnrolmentSorting(TestCase):
                 "contactId": 1,
                 "expiryDate": "HA! NO",
             },
-            {
-                "componentId": 1,
-                "contactId": 2,
-                "expiryDate": "2018-01-10 00:00:00",
-            },
         ]
 
         with self.assertRaises(ValueError):
             sort_enrolments_by_expiry(enrolment_list)
 
+    @tag("edgecase")
     def test_sort_ridiculous_expiry_date(self):
         enrolment_list = [
             {
@@ -204,18 +180,36 @@ class TestEnrolmentSorting(TestCase):
                 "contactId": 1,
                 "expiryDate": "99999999999999999999-01-01 00:00:00",
             },
-            {
-                "componentId": 1,
-                "contactId": 2,
-                "expiryDate": "2018-01-10 00:00:00",
-            },
         ]
 
         with self.assertRaises(OverflowError):
             sort_enrolments_by_expiry(enrolment_list)
 
+    @tag("slow")
+    def test_sort_large_enrolment_list(self):
+        """
+        Sorting a large batch stays correct (and cheap: each date is
+        parsed at most once per distinct string).
+        """
+        enrolment_list = [
+            {
+                "componentId": i,
+                "contactId": 1,
+                "expiryDate": "2018-01-{:02d} 00:00:00".format(i % 28 + 1),
+            }
+            for i in range(10000)
+        ]
+
+        result = sort_enrolments_by_expiry(enrolment_list)
+
+        self.assertEqual(len(result), len(enrolment_list))
+        self.assertEqual(
+            [e["expiryDate"] for e in result],
+            sorted(e["expiryDate"] for e in enrolment_list),
+        )
+
 
-class TestEnrolmentStatus(TestCase):
+class TestEnrolmentStatus(SimpleTestCase):
     """
     Test for valid values in edxlearndot.learndot.EnrolmentStatus.
     """
@@ -233,11 +227,29 @@ class TestLearndot(TestCase):
     what we can test, but we can use a mock client to check tangents
     like the EnrolmentStatusLog recording.
     """
+    @classmethod
+    def setUpClass(cls):
+        super(TestLearndot, cls).setUpClass()
+        # the client only reads .id and .email from the user, so an
+        # unsaved instance avoids the INSERT entirely
+        cls.user = User(id=1, username="test", email="test@gmail.com")
+
     def setUp(self):
-        self.user = User.objects.create(username="test", email="test@gmail.com", password="test")
-        self.client = LearndotAPIClientMock()
+        self.client = copy.copy(_CLIENT_PROTOTYPE)
+        self.client.reset()
+        cache.clear()
+        # keep responses active for the whole test with every endpoint
+        # registered up front, rather than patching requests in and out
+        # around each client call
+        responses.start()
+        self.client.add_responses()
         super(TestLearndot, self).setUp()
 
+    def tearDown(self):
+        super(TestLearndot, self).tearDown()
+        responses.stop()
+        responses.reset()
+
     def test_get_contact_id(self):
         """
         Test get_contact_id succeeds
@@ -249,6 +261,9 @@ class TestLearndot(TestCase):
         """
         Test get_contact_id uses cache
         """
+        # seed the cache directly so the cache-hit branch is exercised
+        # in isolation, without a warmup HTTP round-trip
+        cache.set(self.client._contact_cache_key(self.user), 1)
         self.client.get_contact_id(self.user)
         mock_logger.info.assert_called_with("Using cached contact ID %s", 1)
 
@@ -272,6 +287,7 @@ class TestLearndot(TestCase):
 
     @patch('edxlearndot.learndot.log')
     def test_get_enrolment_id_uses_cache(self, mock_logger):
+        cache.set(self.client._enrolment_cache_key(1, 2), 1)
         self.client.get_enrolment_id(1, 2)
         mock_logger.info.assert_called_with("Using cached enrolment ID %s", 1)
 
@@ -290,6 +306,16 @@ class TestLearndot(TestCase):
             self.client.set_enrolment_status(2, "INVALID")
         self.assertFalse(EnrolmentStatusLog.objects.filter(learndot_enrolment_id=2).exists())
 
+    def test_set_enrolment_status_prefetched_absence_skips_lookup(self):
+        """
+        Test that NO_LOGGED_STATUS skips the per-enrolment status query.
+        """
+        with self.assertNumQueries(0):
+            status = self.client.set_enrolment_status(
+                1, "PASSED", known_status=NO_LOGGED_STATUS, record_log=False
+            )
+        self.assertEqual(status, "PASSED")
+
     def test_check_if_enrolment_and_set_status_to_passed_is_logged(self):
         """
         Test that the update log has status "PASSED".
@@ -304,23 +330,131 @@ class TestLearndotAPIClient(TestCase):
     """
     Test edxlearndot.learndot API calls.
     """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="test", email="test@gmail.com", password="test")
+
     def setUp(self):
         super(TestLearndotAPIClient, self).setUp()
-        self.user = User.objects.create(username="test", email="test@gmail.com", password="test")
         self.client = LearndotAPIClient()
-        responses.start()
         cache.clear()
 
-    def tearDown(self):
-        super(TestLearndotAPIClient, self).tearDown()
-        responses.stop()
-        responses.reset()
+    @responses.activate
+    def test_get_contact_ids_bulk(self):
+        """
+        Test that one batched search resolves contacts by exact email.
+        """
+        other_user = User(id=2, username="rc.test", email="rc.test@gmail.com")
+        unmatched_user = User(id=3, username="missing", email="missing@gmail.com")
+        responses.add(
+            responses.POST,
+            self.client.get_contact_search_url(),
+            json={"results": [
+                {"id": 1, "_displayName_": "Test Name", "email": "test@gmail.com"},
+                {"id": 2, "_displayName_": "Test Name 2", "email": "rc.test@gmail.com"},
+                # a near match the API returns but the exact filter must drop
+                {"id": 3, "_displayName_": "Test Name 3", "email": "test@gmail.com.au"},
+            ]}
+        )
+
+        contact_ids = self.client.get_contact_ids_bulk([self.user, other_user, unmatched_user])
+
+        self.assertEqual(contact_ids, {self.user.id: 1, other_user.id: 2})
+        # contacts that weren't found are negative-cached
+        self.assertEqual(
+            cache.get(self.client._contact_cache_key(unmatched_user)),
+            MISSING_ID_SENTINEL
+        )
+
+    @responses.activate
+    def test_get_contact_ids_bulk_uses_cache(self):
+        """
+        Test that cached and negative-cached contacts skip the API.
+
+        No responses are registered, so any HTTP request would fail.
+        """
+        other_user = User(id=2, username="rc.test", email="rc.test@gmail.com")
+        cache.set(self.client._contact_cache_key(self.user), 1)
+        cache.set(self.client._contact_cache_key(other_user), MISSING_ID_SENTINEL)
+
+        contact_ids = self.client.get_contact_ids_bulk([self.user, other_user])
+
+        self.assertEqual(contact_ids, {self.user.id: 1})
+
+    @responses.activate
+    def test_get_enrolment_ids_bulk(self):
+        """
+        Test that one search resolves enrolments for many contacts.
+
+        When a contact has several uncancelled enrolments, the one with
+        the latest expiry date wins.
+        """
+        responses.add(
+            responses.POST,
+            self.client.get_enrolment_search_url(),
+            json={"results": [
+                {"id": 11, "contactId": 1, "status": "IN_PROGRESS", "expiryDate": "2018-01-01 00:00:00"},
+                {"id": 12, "contactId": 2, "status": "IN_PROGRESS", "expiryDate": "2018-01-01 00:00:00"},
+                {"id": 13, "contactId": 2, "status": "IN_PROGRESS", "expiryDate": "2018-03-01 00:00:00"},
+                {"id": 14, "contactId": 2, "status": "CANCELLED", "expiryDate": "2019-01-01 00:00:00"},
+            ]}
+        )
+
+        enrolment_ids = self.client.get_enrolment_ids_bulk([1, 2, 3], component_id=7)
+
+        self.assertEqual(enrolment_ids, {1: 11, 2: 13})
+        # contacts with no enrolment at all are negative-cached
+        self.assertEqual(
+            cache.get(self.client._enrolment_cache_key(3, 7)),
+            MISSING_ID_SENTINEL
+        )
+
+    @responses.activate
+    def test_get_enrolment_ids_bulk_uses_cache(self):
+        """
+        Test that cached and negative-cached enrolments skip the API.
+
+        No responses are registered, so any HTTP request would fail.
+        """
+        cache.set(self.client._enrolment_cache_key(1, 7), 11)
+        cache.set(self.client._enrolment_cache_key(2, 7), MISSING_ID_SENTINEL)
+
+        enrolment_ids = self.client.get_enrolment_ids_bulk([1, 2], component_id=7)
+
+        self.assertEqual(enrolment_ids, {1: 11})
+
+    @responses.activate
+    def test_find_enrolments_bulk(self):
+        """
+        Test that one search covers a contact's enrolments across components.
+        """
+        responses.add(
+            responses.POST,
+            self.client.get_enrolment_search_url(),
+            json={"results": [
+                {"id": 21, "contactId": 1, "componentId": 7, "status": "IN_PROGRESS",
+                 "expiryDate": "2018-01-01 00:00:00"},
+                {"id": 22, "contactId": 1, "componentId": 8, "status": "IN_PROGRESS",
+                 "expiryDate": "2018-01-01 00:00:00"},
+                {"id": 23, "contactId": 1, "componentId": 8, "status": "IN_PROGRESS",
+                 "expiryDate": "2018-03-01 00:00:00"},
+            ]}
+        )
+
+        enrolment_ids = self.client.find_enrolments_bulk(1, [7, 8, 9])
+
+        self.assertEqual(enrolment_ids, {7: 21, 8: 23})
+        self.assertEqual(
+            cache.get(self.client._enrolment_cache_key(1, 9)),
+            MISSING_ID_SENTINEL
+        )
 
     @ddt.data(
         # Retried API errors
         (429, 'Retrying...'),   # Too Many Requests
+        (502, 'Retrying...'),   # Bad Gateway
+        (503, 'Retrying...'),   # Service Unavailable
         (504, 'Retrying...'),   # Gateway Timeout
-        (502, 'Retrying...'),   # Rate limit
 
         # Just error out, no retries
         (400, None),            # Bad Request
@@ -328,6 +462,10 @@ class TestLearndotAPIClient(TestCase):
     )
     @ddt.unpack
     @patch('edxlearndot.learndot.log')
+    # the retrying library sleeps between attempts; skip the real
+    # backoff so the retry-exhaustion cases don't cost wall-clock time
+    @patch('retrying.time.sleep', lambda *args, **kwargs: None)
+    @responses.activate
     def test_rate_limit_is_retried(self, status_code, retry, mock_logger):
         """
         Test that the rate limit and gateway timeout errors are logged, trigger retries to the API.
@@ -349,46 +487,81 @@ class TestLearndotAPIClient(TestCase):
 
 
 class TestLearndotCommands(TestCase):
-    def _mock_edx_modules(self):
-        sys.modules['lms'] = MagicMock()
-        sys.modules['lms.djangoapps'] = MagicMock()
-        sys.modules['lms.djangoapps.courseware'] = MagicMock()
-        sys.modules['lms.djangoapps.courseware.courses'] = MagicMock()
-        sys.modules['lms.djangoapps.grades'] = MagicMock()
-        sys.modules['lms.djangoapps.grades.config'] = MagicMock()
-        sys.modules['lms.djangoapps.grades.course_grade_factory'] = MagicMock()
-        sys.modules['common'] = MagicMock()
-        sys.modules['common.djangoapps'] = MagicMock()
-        sys.modules['common.djangoapps.student'] = MagicMock()
-        sys.modules['common.djangoapps.student.models'] = MagicMock()
+    #: edX platform modules the management command imports, which
+    #: don't exist outside an edX installation.
+    _EDX_MODULES = (
+        'lms',
+        'lms.djangoapps',
+        'lms.djangoapps.courseware',
+        'lms.djangoapps.courseware.courses',
+        'lms.djangoapps.grades',
+        'lms.djangoapps.grades.config',
+        'lms.djangoapps.grades.course_grade_factory',
+        'lms.djangoapps.grades.models',
+        'common',
+        'common.djangoapps',
+        'common.djangoapps.student',
+        'common.djangoapps.student.models',
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        # mock the edX modules once for the whole class rather than
+        # rebuilding a dozen MagicMocks per test, saving the originals
+        # so other test modules see an untouched sys.modules
+        super(TestLearndotCommands, cls).setUpClass()
+        cls._original_modules = {name: sys.modules.get(name) for name in cls._EDX_MODULES}
+        for name in cls._EDX_MODULES:
+            sys.modules[name] = MagicMock()
+
+    @classmethod
+    def tearDownClass(cls):
+        for name, module in cls._original_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        super(TestLearndotCommands, cls).tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="test", email="test@gmail.com", password="test")
 
     def setUp(self):
         self.course_key = "course-v1:Test+TestCourse+201801"
-        self.user = User.objects.create(username="test", email="test@gmail.com", password="test")
-        self.client = LearndotAPIClientMock()
-        self._mock_edx_modules()
+        self.client = copy.copy(_CLIENT_PROTOTYPE)
+        self.client.reset()
         super(TestLearndotCommands, self).setUp()
 
-    @patch('edxlearndot.learndot.requests.post')
+    @patch('edxlearndot.learndot.requests.Session.post')
     @patch('edxlearndot.management.commands.update_learndot_enrolments.CourseEnrollment.objects')
-    @patch('edxlearndot.management.commands.update_learndot_enrolments.LearndotAPIClient.get_contact_id')
-    @patch('edxlearndot.management.commands.update_learndot_enrolments.LearndotAPIClient.get_enrolment_id')
-    def test_update_learndot_enrolments_with_date_range(self, enrolment_id_mock, contact_id_mock, objects_mock, *args):
-        def filter_mock(*args, created__range, **kwargs):
-            enrollments = {}
+    @patch('edxlearndot.management.commands.update_learndot_enrolments.PersistentCourseGrade')
+    @patch('edxlearndot.management.commands.update_learndot_enrolments.LearndotAPIClient.get_contact_ids_bulk')
+    @patch('edxlearndot.management.commands.update_learndot_enrolments.LearndotAPIClient.get_enrolment_ids_bulk')
+    def test_update_learndot_enrolments_with_date_range(
+            self, enrolment_ids_mock, contact_ids_mock, persistent_grade_mock, objects_mock, *args
+    ):
+        # enrollments all created a month ago, so only date ranges
+        # covering the past year find them
+        enrollment_mocks = [MagicMock() for _ in range(10)]
 
-            # only creating enrollments for the past year
-            for _ in range(10):
-                enrollments[timezone.now() - datetime.timedelta(days=30)] = MagicMock()
-            output = []
-            for enrollment_date, enrollment_mock in enrollments.items():
-                if created__range[0] <= enrollment_date <= created__range[1]:
-                    output.append(enrollment_mock)
-            return output
+        def filter_mock(*args, created__range, **kwargs):
+            enrollment_date = timezone.now() - datetime.timedelta(days=30)
+            output = [
+                enrollment_mock for enrollment_mock in enrollment_mocks
+                if created__range[0] <= enrollment_date <= created__range[1]
+            ]
+            queryset = MagicMock()
+            queryset.select_related.return_value = output
+            return queryset
 
         objects_mock.filter = filter_mock
-        contact_id_mock.return_value = "contact_id"
-        enrolment_id_mock.return_value = 412
+        # grades are persistent, and every enrolled user has passed
+        persistent_grade_mock.objects.filter.return_value.values_list.return_value = [
+            enrollment_mock.user.id for enrollment_mock in enrollment_mocks
+        ]
+        contact_ids_mock.side_effect = lambda users: {user.id: "contact_id" for user in users}
+        enrolment_ids_mock.side_effect = lambda contact_ids, component_id: {cid: 412 for cid in contact_ids}
 
         from edxlearndot.management.commands.update_learndot_enrolments import Command
         CourseMapping.objects.create(learndot_component_id=1, edx_course_key=self.course_key)
@@ -404,7 +577,7 @@ class TestLearndotCommands(TestCase):
         self.assertTrue(EnrolmentStatusLog.objects.get(learndot_enrolment_id=412))
 
         # testing enrollments are not found
-        enrolment_id_mock.return_value = 300
+        enrolment_ids_mock.side_effect = lambda contact_ids, component_id: {cid: 300 for cid in contact_ids}
         Command().handle(
             course_id=[self.course_key],
             start='two years ago',
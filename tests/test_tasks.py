@@ -0,0 +1,101 @@
+"""
+Test the Celery task behind the passing-grade signal.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+from mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from edxlearndot.models import CourseMapping
+from edxlearndot.signals import listen_for_passing_grade
+from edxlearndot.tasks import update_learndot_enrolment
+
+
+class TestUpdateLearndotEnrolmentTask(TestCase):
+    """
+    Test edxlearndot.tasks.update_learndot_enrolment, run synchronously.
+    """
+    course_id = "course-v1:Test+TestCourse+201801"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="test", email="test@gmail.com", password="test")
+        CourseMapping.objects.bulk_create([
+            CourseMapping(learndot_component_id=7, edx_course_key=cls.course_id),
+            CourseMapping(learndot_component_id=8, edx_course_key=cls.course_id),
+        ])
+
+    @patch("edxlearndot.tasks._CLIENT")
+    def test_missing_user_returns_early(self, client_mock):
+        """
+        Test that an unknown user ID never reaches the API client.
+        """
+        update_learndot_enrolment(self.user.id + 1000, self.course_id)
+        client_mock.get_contact_id.assert_not_called()
+
+    @patch("edxlearndot.tasks._CLIENT")
+    def test_unmapped_course_returns_early(self, client_mock):
+        """
+        Test that a course without mappings never reaches the API client.
+        """
+        update_learndot_enrolment(self.user.id, "course-v1:Test+OtherCourse+201801")
+        client_mock.get_contact_id.assert_not_called()
+
+    @patch("edxlearndot.tasks._CLIENT")
+    def test_updates_each_mapped_component(self, client_mock):
+        """
+        Test the fan-out over every component mapped to the course.
+
+        One bulk enrolment search covers all the components, and each
+        resolved enrolment is set to PASSED.
+        """
+        client_mock.get_contact_id.return_value = 1
+        client_mock.find_enrolments_bulk.return_value = {7: 21, 8: 22}
+
+        update_learndot_enrolment(self.user.id, self.course_id)
+
+        client_mock.find_enrolments_bulk.assert_called_once_with(1, [7, 8])
+        client_mock.set_enrolment_status_to_passed.assert_any_call(21)
+        client_mock.set_enrolment_status_to_passed.assert_any_call(22)
+        self.assertEqual(client_mock.set_enrolment_status_to_passed.call_count, 2)
+
+    @patch("edxlearndot.tasks.log")
+    @patch("edxlearndot.tasks._CLIENT")
+    def test_missing_enrolment_is_logged(self, client_mock, log_mock):
+        """
+        Test that components without enrolments are logged and skipped.
+        """
+        client_mock.get_contact_id.return_value = 1
+        client_mock.find_enrolments_bulk.return_value = {7: 21}
+
+        update_learndot_enrolment(self.user.id, self.course_id)
+
+        client_mock.set_enrolment_status_to_passed.assert_called_once_with(21)
+        log_mock.error.assert_called_once_with(
+            "No enrolment found for contact %s, component %s", 1, 8
+        )
+
+
+class TestListenForPassingGrade(TestCase):
+    """
+    Test that the signal handler queues the task only for mapped courses.
+    """
+    course_id = "course-v1:Test+TestCourse+201801"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="test", email="test@gmail.com", password="test")
+
+    @patch("edxlearndot.signals.update_learndot_enrolment")
+    def test_mapped_course_queues_task(self, task_mock):
+        CourseMapping.objects.create(learndot_component_id=1, edx_course_key=self.course_id)
+        listen_for_passing_grade(None, self.user, self.course_id)
+        task_mock.delay.assert_called_once_with(self.user.id, self.course_id)
+
+    @patch("edxlearndot.signals.update_learndot_enrolment")
+    def test_unmapped_course_is_ignored(self, task_mock):
+        listen_for_passing_grade(None, self.user, self.course_id)
+        task_mock.delay.assert_not_called()
@@ -1,58 +1,63 @@
 """ This is utils module for tests """
 import responses
 
-from django.test import override_settings
-
 from edxlearndot.learndot import LearndotAPIClient, EnrolmentStatus
 
 
+#: JSON bodies registered by `add_responses`, built once at import
+#: rather than on every registration.
+CONTACT_SEARCH_JSON = {"results": [
+    {"id": 1, "_displayName_": "Test Name", "email": "test@gmail.com"},
+    {"id": 2, "_displayName_": "Test Name 2", "email": "rc.test@gmail.com"},
+]}
+
+ENROLMENT_SEARCH_JSON = {"results": [{"id": 1, "status": EnrolmentStatus.IN_PROGRESS}]}
+
+
 class LearndotAPIClientMock(LearndotAPIClient):
     """
     Mock client for tests.
+
+    Construction is settings- and session-building work that's
+    identical for every test, so tests share one prototype instance
+    via `copy.copy` and call `reset` to get a clean slate.
     """
 
-    @override_settings(LEARNDOT_API_KEY='test')
-    def get_api_key(self):
-        return super(LearndotAPIClientMock, self).get_api_key()
-    
-    @override_settings(LEARNDOT_API_BASE_URL='https://localhost/learndot/v2/api')
-    def get_api_base_url(self):
-        return super(LearndotAPIClientMock, self).get_api_base_url()
+    def __init__(self):
+        super(LearndotAPIClientMock, self).__init__()
+        # seed the memoized settings directly, instead of entering an
+        # override_settings context (and firing setting_changed) on
+        # every get_api_key/get_api_base_url call
+        self._api_key = 'test'
+        self._api_base_url = 'https://localhost/learndot/v2/api'
 
-    @responses.activate
-    def get_contact_id(self, user):
+    def reset(self):
         """
-        Mock response returns for get_contact.
+        Clear per-instance state carried over from a copied prototype.
         """
-        responses.add(
-            responses.POST,
-            self.get_contact_search_url(),
-            json={"results": [
-                {"id": 1, "_displayName_": "Test Name", "email": "test@gmail.com"},
-                {"id": 2, "_displayName_": "Test Name 2", "email": "rc.test@gmail.com"},
-            ]}
-        )
-        return super(LearndotAPIClientMock, self).get_contact_id(user)
+        self._contact_ids = {}
+        self._enrolment_ids = {}
 
-    @responses.activate
-    def get_enrolment_id(self, contact_id, component_id):
+    def add_responses(self, enrolment_ids=(1, 2)):
         """
-        Mock response for get_enrolment.
+        Register mock responses for every endpoint this client touches.
+
+        Call this once per test, inside an active `responses` mock,
+        instead of patching requests in and out around each client
+        method call.
         """
-        response = responses.add(
+        responses.add(
             responses.POST,
-            self.get_enrolment_search_url(),
-            json={"results": [{"id": 1, "status": EnrolmentStatus.IN_PROGRESS}]}
+            self.get_contact_search_url(),
+            json=CONTACT_SEARCH_JSON
         )
-        return super(LearndotAPIClientMock, self).get_enrolment_id(contact_id, component_id)
-
-    @responses.activate
-    def set_enrolment_status(self, enrolment_id, status, unconditional=False):
-        """
-        Mock response from set enrolment status
-        """
-        response = responses.add(
+        responses.add(
             responses.POST,
-            self.get_enrolment_management_url(enrolment_id)
+            self.get_enrolment_search_url(),
+            json=ENROLMENT_SEARCH_JSON
         )
-        return super(LearndotAPIClientMock, self).set_enrolment_status(enrolment_id, status)
+        for enrolment_id in enrolment_ids:
+            responses.add(
+                responses.POST,
+                self.get_enrolment_management_url(enrolment_id)
+            )